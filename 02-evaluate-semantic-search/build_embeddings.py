@@ -0,0 +1,29 @@
+import orjson
+from embedding_model import load_embedding_model, save_embeddings, compute_data_signature, EMBEDDINGS_PATH, EMBEDDING_IDS_PATH
+from eval_common import CONFIG, encode_documents
+
+def build_embeddings(file_path: str, model_name: str):
+    """
+    One-time build step: embeds every headline of the test subset and writes the vectors
+    (float32 .npy) plus their IDs to disk, where all evaluation scripts memory-map them.
+    """
+    print(f"--- 1. Loading test subset from {file_path}...")
+    try:
+        with open(file_path, 'rb') as f:
+            records = [orjson.loads(line) for line in f.read().splitlines() if line]
+    except FileNotFoundError:
+        print(f"FATAL ERROR: Data file not found at '{file_path}'. Please run 'generate-test-subset.py' first.")
+        return
+    documents = [record['headline'] for record in records]
+    ids = [record['id'] for record in records]
+    print(f"    ✅ Loaded {len(documents)} headlines.")
+
+    print(f"--- 2. Embedding headlines with '{model_name}'...")
+    model = load_embedding_model(model_name)
+    embeddings = encode_documents(model, documents)
+
+    save_embeddings(ids, embeddings, compute_data_signature(file_path, model_name))
+    print(f"--- 3. Saved {embeddings.shape[0]} x {embeddings.shape[1]} embeddings to '{EMBEDDINGS_PATH}' (IDs in '{EMBEDDING_IDS_PATH}')")
+
+if __name__ == "__main__":
+    build_embeddings(CONFIG.data_file_path, CONFIG.embedding_model_name)
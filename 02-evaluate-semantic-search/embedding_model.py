@@ -0,0 +1,120 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+# --- Shared Embedding Model Loader ---
+# Used by all three evaluation scripts so the model is always loaded the same way.
+
+# Query embeddings are cached here across runs, keyed by (model name, query text)
+QUERY_CACHE_PATH = "./query_embedding_cache.pkl"
+QUERY_CACHE_SIZE = 1024 # Least recently used entries beyond this are dropped
+
+# Document embeddings are computed once (by build_embeddings.py or the first evaluation run)
+# and saved here; later runs memory-map them instead of re-encoding the whole corpus
+EMBEDDINGS_PATH = "./data/embeddings.npy"
+EMBEDDING_IDS_PATH = "./data/embedding_ids.txt"
+# Signature of the data file and model the saved embeddings were computed from
+EMBEDDINGS_SIGNATURE_PATH = "./data/embeddings_signature.txt"
+
+_query_cache = None
+
+def load_embedding_model(model_name: str) -> SentenceTransformer:
+    """Loads the Sentence Transformer: fp16 on the GPU when available, otherwise ONNX Runtime on the CPU."""
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    if device == 'cpu':
+        # ONNX Runtime on the CPU, fp16 on the GPU: see load_embedding_model() in 01-semantic-search
+        try:
+            return SentenceTransformer(model_name, device=device, backend='onnx')
+        except Exception as e:
+            print(f"    Note: ONNX backend unavailable ({e}); falling back to PyTorch.")
+    model = SentenceTransformer(model_name, device=device)
+    if device == 'cuda':
+        model.half()
+    return model
+
+def _load_query_cache() -> dict:
+    global _query_cache
+    if _query_cache is None:
+        try:
+            with open(QUERY_CACHE_PATH, 'rb') as f:
+                _query_cache = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            _query_cache = {}
+    return _query_cache
+
+def _save_query_cache(cache: dict):
+    # Write to a temporary file first so a concurrently running script never reads half a file
+    tmp_path = f"{QUERY_CACHE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(cache, f)
+    os.replace(tmp_path, QUERY_CACHE_PATH)
+
+def encode_queries(model: SentenceTransformer, model_name: str, queries: list) -> np.ndarray:
+    """
+    Embeds the queries in one batch, reusing embeddings cached by earlier calls (and earlier runs),
+    so a repeated query costs a dictionary lookup instead of a transformer forward pass.
+    """
+    cache = _load_query_cache()
+    keys = [hashlib.sha256(f"{model_name}\0{query}".encode('utf-8')).hexdigest() for query in queries]
+
+    # Encode only the distinct queries that are not cached yet
+    missing = {key: query for key, query in zip(keys, queries) if key not in cache}
+    if missing:
+        embeddings = model.encode(
+            list(missing.values()), batch_size=32, convert_to_numpy=True, normalize_embeddings=True
+        )
+        cache.update(zip(missing.keys(), embeddings))
+
+    # Mark the used entries as most recently used, then evict the oldest beyond the limit
+    for key in keys:
+        cache[key] = cache.pop(key)
+    while len(cache) > QUERY_CACHE_SIZE:
+        del cache[next(iter(cache))]
+    if missing:
+        _save_query_cache(cache)
+
+    return np.stack([cache[key] for key in keys])
+
+def compute_data_signature(file_path: str, model_name: str) -> str:
+    """
+    Short content hash of the data file plus the model name, used to tell whether saved
+    embeddings (or a cached collection) still match the current data and model. The IDs
+    alone cannot tell: every regenerated subset is numbered doc_0, doc_1, ... again.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(model_name.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def save_embeddings(ids: list, embeddings: np.ndarray, signature: str):
+    """Writes the document embeddings (float32 .npy), their IDs (one per line) and their data signature to disk."""
+    np.save(EMBEDDINGS_PATH, np.asarray(embeddings, dtype=np.float32))
+    with open(EMBEDDING_IDS_PATH, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(ids))
+    # Written last, so interrupted saves are never mistaken for valid ones
+    with open(EMBEDDINGS_SIGNATURE_PATH, 'w', encoding='utf-8') as f:
+        f.write(signature)
+
+def load_cached_embeddings(signature: str):
+    """
+    Returns (ids, embeddings) saved by save_embeddings() for the given data signature, with the
+    embeddings memory-mapped read-only (no parsing, no copy; the OS shares the pages between
+    processes), or None if there are none or they were computed from other data or another model.
+    """
+    try:
+        with open(EMBEDDINGS_SIGNATURE_PATH, 'r', encoding='utf-8') as f:
+            if f.read() != signature:
+                return None
+        with open(EMBEDDING_IDS_PATH, 'r', encoding='utf-8') as f:
+            ids = f.read().split('\n')
+        embeddings = np.load(EMBEDDINGS_PATH, mmap_mode='r')
+    except FileNotFoundError:
+        return None
+    if len(ids) != len(embeddings):
+        return None
+    return ids, embeddings
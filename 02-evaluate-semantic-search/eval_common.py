@@ -0,0 +1,128 @@
+import os
+import functools
+from dataclasses import dataclass
+import orjson
+import chromadb
+from sentence_transformers import SentenceTransformer
+import numpy as np
+from vector_backends import load_backend
+from embedding_model import load_embedding_model, load_cached_embeddings, save_embeddings, compute_data_signature
+
+# --- Shared Setup for the Evaluation Scripts ---
+# All three evaluation scripts search the same test subset with the same model,
+# so the data loading, embedding and ChromaDB setup live here once.
+
+@dataclass(frozen=True)
+class EvalConfig:
+    """Settings shared by all evaluation scripts (frozen, so they cannot drift between scripts)."""
+    data_file_path: str = "./data/test_data_subset.json"
+    collection_name: str = "news_test_collection"
+    # On-disk ChromaDB store shared by all evaluation scripts, so the
+    # headlines are only embedded once instead of on every run
+    chroma_cache_path: str = "./chroma_eval_cache"
+    # Vector index used for the searches: "chroma" (default) or an index
+    # built from the cached embeddings, e.g. VECTOR_BACKEND=usearch-int8
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "chroma")
+    embedding_model_name: str = 'all-MiniLM-L6-v2'
+    # Maximum number of items upserted into ChromaDB in one call
+    batch_size: int = 5000
+
+CONFIG = EvalConfig()
+
+def setup_chroma_and_embed_data(client: chromadb.Client, model: SentenceTransformer, config: EvalConfig = CONFIG):
+    """Loads the subset data and populates a new ChromaDB collection, using batching to avoid errors."""
+    print(f"--- Setting up collection '{config.collection_name}'...")
+
+    collection = client.get_or_create_collection(name=config.collection_name)
+
+    try:
+        with open(config.data_file_path, 'rb') as f:
+            # Parse the JSON Lines file with orjson straight from the raw bytes,
+            # keeping only the two fields we actually use
+            records = [orjson.loads(line) for line in f.read().splitlines() if line]
+            documents = [record['headline'] for record in records]
+            ids = [record['id'] for record in records]
+            total_docs = len(documents)
+            signature = compute_data_signature(config.data_file_path, config.embedding_model_name)
+
+            # Reuse the persisted embeddings if a previous run already indexed this data with this model
+            if (collection.metadata or {}).get("data_signature") == signature and collection.count() == total_docs:
+                print(f"    ✅ Reusing {total_docs} cached documents from '{config.chroma_cache_path}'.")
+                return collection
+            if collection.count() > 0:
+                # Stale cache from a different test subset or model: start from an empty collection
+                client.delete_collection(config.collection_name)
+                collection = client.create_collection(name=config.collection_name)
+
+            print(f"    Total documents to embed: {total_docs}")
+
+            # Use the precomputed embeddings (see build_embeddings.py) when they match this data
+            cached = load_cached_embeddings(signature)
+            if cached is not None and cached[0] == ids:
+                embeddings = cached[1]
+                print("    ✅ Loaded precomputed embeddings.")
+            else:
+                # Generate ALL embeddings first, and save them for the next runs
+                print("    Generating all document embeddings...")
+                embeddings = encode_documents(model, documents)
+                save_embeddings(ids, embeddings, signature)
+                print("    ✅ Embeddings generated.")
+
+            # --- IMPLEMENT BATCHING FOR ADDING TO CHROMA ---
+            # Split the embeddings into equal batches (views of the array, no copies), slice the
+            # documents and ids at the same boundaries, and upsert them, so re-running after an
+            # interrupted insert is safe
+            n_batches = -(-total_docs // config.batch_size)
+            start = 0
+            for batch_number, batch_embeddings in enumerate(np.array_split(np.asarray(embeddings), n_batches), start=1):
+                end = start + len(batch_embeddings)
+                print(f"    Upserting batch {batch_number}/{n_batches} ({end - start} items)...")
+
+                # Upsert the current batch of documents and embeddings into the collection
+                collection.upsert(
+                    embeddings=batch_embeddings,
+                    documents=documents[start:end],
+                    ids=ids[start:end]
+                )
+                start = end
+
+            # --- END BATCHING ---
+
+            # Record the data signature only now, so an interrupted insert is rebuilt next time
+            collection.modify(metadata={"data_signature": signature})
+
+            print(f"    ✅ Successfully loaded {collection.count()} documents into ChromaDB.")
+            return collection
+    except FileNotFoundError:
+        print(f"FATAL ERROR: Data file not found at '{config.data_file_path}'. Please ensure 'data/test_data_subset.json' exists.")
+        return None
+    except Exception as e:
+        print(f"FATAL ERROR during data processing or ChromaDB insert: {e}")
+        return None
+
+def encode_documents(model: SentenceTransformer, documents: list) -> np.ndarray:
+    """Embeds the headlines as normalized float32 vectors (the format saved to data/embeddings.npy)."""
+    return model.encode(
+        documents, batch_size=128, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=True
+    )
+
+# Both loaders take no arguments: lru_cache keys on the arguments actually passed, so
+# get_embedding_model() and get_embedding_model(CONFIG) would each load their own model
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_model() -> SentenceTransformer:
+    """Loads the embedding model once per process."""
+    return load_embedding_model(CONFIG.embedding_model_name)
+
+@functools.lru_cache(maxsize=None)
+def get_collection():
+    """
+    Returns the searchable collection for the evaluations (the cached ChromaDB collection,
+    wrapped in the configured VECTOR_BACKEND index), or None if the setup failed.
+    The result is memoized, so the model, data and index are only loaded once per process.
+    """
+    chroma_client = chromadb.PersistentClient(path=CONFIG.chroma_cache_path)
+    collection = setup_chroma_and_embed_data(chroma_client, get_embedding_model(), CONFIG)
+    if collection is None:
+        return None
+    return load_backend(collection, CONFIG.vector_backend)
@@ -0,0 +1,39 @@
+import numpy as np
+from numba import njit
+
+# --- Numba-compiled Evaluation Kernels ---
+# The scoring loops of the evaluation scripts work on plain NumPy arrays, so Numba
+# compiles them to native code (cached on disk after the first run).
+
+def doc_ids_to_indices(doc_ids: list) -> np.ndarray:
+    """
+    Converts 'doc_<n>' IDs (a flat list, or one list per query) into an int32 array of
+    document indices. Any other value (e.g. the "None" placeholder) becomes -1, and so do the
+    missing slots of rows shorter than the longest one (e.g. when the FAISS backend returns
+    fewer than K results for a query).
+    """
+    def to_index(doc_id: str) -> int:
+        return int(doc_id[4:]) if doc_id.startswith('doc_') and doc_id[4:].isdigit() else -1
+
+    if doc_ids and isinstance(doc_ids[0], list):
+        indices = np.full((len(doc_ids), max(map(len, doc_ids))), -1, dtype=np.int32)
+        for i, row in enumerate(doc_ids):
+            indices[i, :len(row)] = [to_index(doc_id) for doc_id in row]
+        return indices
+    return np.array([to_index(doc_id) for doc_id in doc_ids], dtype=np.int32)
+
+@njit(cache=True)
+def recall_hits(result_ids: np.ndarray, expected_ids: np.ndarray) -> np.ndarray:
+    """
+    For each query, True if its expected document index is among its top K result indices.
+    An unknown expected ID (-1) never counts as found, even against -1 padding.
+    """
+    hits = np.zeros(expected_ids.size, dtype=np.bool_)
+    for i in range(expected_ids.size):
+        if expected_ids[i] < 0:
+            continue
+        for j in range(result_ids.shape[1]):
+            if result_ids[i, j] == expected_ids[i]:
+                hits[i] = True
+                break
+    return hits
@@ -1,5 +1,6 @@
-import json
+import orjson
 import pandas as pd
+import numpy as np
 import os
 
 # --- Configuration Constants ---
@@ -15,16 +16,17 @@ def load_data(file_path: str) -> pd.DataFrame or None:
     1. Loads the data from the JSON Lines file and 2. converts it to a pandas DataFrame.
     """
     print(f"--- 1. Loading data from {file_path}...")
-    data = []
-    
     # Ensure the data directory exists before attempting to read/write
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            # The dataset is a JSON Lines file, so we load line by line
-            for line in f:
-                data.append(json.loads(line))
+        with open(file_path, 'rb') as f:
+            # The dataset is a JSON Lines file: read the raw bytes once and parse
+            # each line with orjson, which is much faster than a json.loads loop
+            raw = f.read()
+        # All fields are kept, so the saved test subset has the full records; the
+        # scripts reading it project out the fields they need
+        data = [orjson.loads(line) for line in raw.splitlines() if line]
         
         # 2. Convert to DataFrame
         df = pd.DataFrame(data)
@@ -50,6 +52,8 @@ def process_and_save_test_set(df: pd.DataFrame, output_path: str, max_records: i
     
     # 3. Filter to the first N records
     df_subset = df.head(max_records).copy()
+    # Store categories as integer codes so the filter below compares ints, not strings
+    df_subset['category'] = df_subset['category'].astype('category')
     
     # 4. Identify the top N most frequent and diverse categories
     # Sorting by frequency helps select categories with enough samples
@@ -60,8 +64,11 @@ def process_and_save_test_set(df: pd.DataFrame, output_path: str, max_records: i
         print(f"        - {cat}")
 
     # Filter the WHOLE dataset (or the first 10k, for simplicity) to include ONLY these selected categories
-    # FIX: Adding .copy() to explicitly create a new DataFrame, resolving the SettingWithCopyWarning.
-    df_test_set = df_subset[df_subset['category'].isin(top_categories)].copy()
+    # The mask is built by comparing each row's category code against the few selected codes.
+    # Boolean-mask iloc already returns a new DataFrame, so no .copy() is needed.
+    top_codes = df_subset['category'].cat.categories.get_indexer(top_categories)
+    mask = np.isin(df_subset['category'].cat.codes.to_numpy(), top_codes)
+    df_test_set = df_subset.iloc[mask].reset_index(drop=True)
     
     print(f"    ✅ Filtered down to {len(df_test_set)} records belonging to these categories.")
     
@@ -70,11 +77,12 @@ def process_and_save_test_set(df: pd.DataFrame, output_path: str, max_records: i
     
     # 5. Write the final DataFrame to a new JSON Lines file
     try:
-        # Convert DataFrame to JSON Lines format (records)
-        json_records = df_test_set.to_json(orient='records', lines=True)
+        # Convert DataFrame to JSON Lines format (records), streaming one orjson-encoded
+        # line per record instead of building the whole file as one big string first
+        records = df_test_set.to_dict(orient='records')
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(json_records)
+        with open(output_path, 'wb') as f:
+            f.writelines(orjson.dumps(record) + b'\n' for record in records)
             
         print(f"--- 3. Successfully saved {len(df_test_set)} test set records to '{output_path}'")
         print("\nNow you can easily generate sample queries based on the categories in this new file.")
@@ -0,0 +1,53 @@
+import io
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import chromadb
+
+import quantitative_retrieval_evaluation as recall_eval
+import distance_threshold_analysis as threshold_eval
+import semantic_robustness_test as robustness_eval
+from eval_common import CONFIG, get_collection, get_embedding_model, setup_chroma_and_embed_data
+
+# The three evaluations, run in this order in the final report
+EVALUATIONS = {
+    "Recall @ K": lambda collection, model: recall_eval.evaluate_recall_at_k(collection, model, recall_eval.GOLDEN_TEST_SET),
+    "Distance Threshold": threshold_eval.analyze_threshold,
+    "Semantic Robustness": robustness_eval.analyze_robustness,
+}
+
+def run_evaluation(name: str) -> str:
+    """Runs one evaluation in a worker process against the cached collection and returns its output."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        collection = get_collection()
+        if collection:
+            EVALUATIONS[name](collection, get_embedding_model())
+    return output.getvalue()
+
+if __name__ == "__main__":
+    # 1. Make sure the shared ChromaDB cache is populated BEFORE starting the workers,
+    # so they only ever read it instead of all embedding the same data at once
+    try:
+        chroma_client = chromadb.PersistentClient(path=CONFIG.chroma_cache_path)
+        embedding_model = get_embedding_model()
+    except Exception as e:
+        print(f"Initialization Error: {e}")
+        exit()
+
+    if setup_chroma_and_embed_data(chroma_client, embedding_model) is None:
+        exit()
+    del chroma_client, embedding_model
+
+    # 2. Run the three evaluations in parallel worker processes ('spawn' gives each worker
+    # a clean interpreter instead of forking the model and database handles of this one)
+    print(f"\n--- Running {len(EVALUATIONS)} evaluations in parallel ---")
+    with ProcessPoolExecutor(max_workers=len(EVALUATIONS), mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {name: executor.submit(run_evaluation, name) for name in EVALUATIONS}
+
+        # 3. Print each report in a fixed order once its worker has finished
+        for name, future in futures.items():
+            print("\n" + "#"*70)
+            print(f"# {name}")
+            print("#"*70)
+            print(future.result())
@@ -0,0 +1,230 @@
+import numpy as np
+import chromadb
+from embedding_model import load_cached_embeddings
+
+# --- Alternative Vector Search Backends ---
+# ChromaDB stores every headline as a full float32 vector. The classes below
+# build a compressed index from the SAME ids/documents/embeddings (the precomputed
+# embeddings file, or the cached Chroma collection) and answer `query()` with a
+# Chroma-style result dict, so the evaluation functions work unchanged.
+#
+# Distances are always reported as squared L2 (ChromaDB's default metric), so the
+# L2_DISTANCE_THRESHOLD used in distance_threshold_analysis.py keeps its meaning.
+
+# Candidates fetched from the compressed index per requested result; they are
+# re-ranked with (approximately) exact distances before the top N are returned
+RESCORE_MULTIPLIER = 4
+
+
+class Int8USearchIndex:
+    """
+    Scalar (int8) quantized index backed by USearch.
+    Each 384-dim float32 vector (1536 bytes) is stored as 384 int8 values (384 bytes),
+    and USearch scores candidates with native int8 dot products.
+    """
+
+    def __init__(self, ids: list, documents: list, embeddings: np.ndarray):
+        from usearch.index import Index
+
+        self.ids = list(ids)
+        self.documents = list(documents)
+
+        # Per-dimension [min, max] ranges used to map each value onto the 256 int8 buckets
+        # (the same scheme as sentence_transformers' quantize_embeddings(precision='int8'))
+        self.ranges = np.vstack([embeddings.min(axis=0), embeddings.max(axis=0)])
+        self.steps = (self.ranges[1] - self.ranges[0]) / 255
+        self.codes = self._quantize(embeddings)
+
+        self.index = Index(ndim=embeddings.shape[1], metric='ip', dtype='i8')
+        self.index.add(np.arange(len(self.ids)), self.codes)
+
+    def _quantize(self, embeddings: np.ndarray) -> np.ndarray:
+        codes = (embeddings - self.ranges[0]) / self.steps - 128
+        # Queries can fall slightly outside the document ranges, so clip before casting
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def _dequantize(self, codes: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) + 128) * self.steps + self.ranges[0]
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def query(self, query_embeddings: np.ndarray, n_results: int, include: list = None) -> dict:
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        n_candidates = min(n_results * RESCORE_MULTIPLIER, self.count())
+
+        # 1. Fast int8 search for a wider candidate list (queries are quantized the same way)
+        matches = self.index.search(self._quantize(query_embeddings), n_candidates)
+        candidates = np.atleast_2d(matches.keys).astype(np.int64)
+
+        # 2. Rescore the candidates against their de-quantized vectors and keep the top N
+        results = {'ids': [], 'documents': [], 'distances': []}
+        for query, keys in zip(query_embeddings, candidates):
+            distances = ((self._dequantize(self.codes[keys]) - query) ** 2).sum(axis=1)
+            order = np.argsort(distances)[:n_results]
+            results['ids'].append([self.ids[k] for k in keys[order]])
+            results['documents'].append([self.documents[k] for k in keys[order]])
+            results['distances'].append(distances[order].tolist())
+        return results
+
+
+class FaissIVFPQIndex:
+    """
+    Product-quantized inverted-file index (IVF-PQ) backed by FAISS.
+    Each vector is split into PQ_SUBVECTORS sub-vectors that are stored as one 8-bit
+    codebook index each (32 bytes instead of 1536), and distances are computed from
+    small lookup tables. Only IVF_NPROBE of the IVF_NLIST clusters are scanned per query.
+    """
+
+    IVF_NLIST = 64
+    IVF_NPROBE = 8
+    PQ_SUBVECTORS = 32
+    PQ_BITS = 8
+
+    def __init__(self, ids: list, documents: list, embeddings: np.ndarray):
+        import faiss
+
+        self.ids = list(ids)
+        self.documents = list(documents)
+
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        dimension = embeddings.shape[1]
+        quantizer = faiss.IndexFlatL2(dimension)
+        self.index = faiss.IndexIVFPQ(quantizer, dimension, self.IVF_NLIST, self.PQ_SUBVECTORS, self.PQ_BITS)
+        # The 8k-headline test subset is slightly below FAISS' recommended 39 training points per
+        # PQ centroid; that is still plenty for 8-bit codebooks, so silence the per-sub-vector warning
+        self.index.pq.cp.min_points_per_centroid = 32
+        self.index.train(embeddings)
+        self.index.add(embeddings)
+        self.index.nprobe = self.IVF_NPROBE
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def query(self, query_embeddings: np.ndarray, n_results: int, include: list = None) -> dict:
+        query_embeddings = np.ascontiguousarray(np.atleast_2d(query_embeddings), dtype=np.float32)
+
+        # FAISS returns (approximate) squared L2 distances, the same metric as Chroma
+        distances, keys = self.index.search(query_embeddings, n_results)
+
+        results = {'ids': [], 'documents': [], 'distances': []}
+        for row_distances, row_keys in zip(distances, keys):
+            # FAISS pads with -1 when the probed clusters hold fewer than n_results vectors
+            found = row_keys >= 0
+            results['ids'].append([self.ids[k] for k in row_keys[found]])
+            results['documents'].append([self.documents[k] for k in row_keys[found]])
+            results['distances'].append(row_distances[found].tolist())
+        return results
+
+
+class BinaryRescoreIndex:
+    """
+    Two-stage binary-quantized search in NumPy.
+    Stage 1 keeps only the sign bit of each dimension (384 bits = 48 bytes per vector) and
+    ranks every document by Hamming distance (XOR + popcount) to shortlist candidates.
+    Stage 2 rescores that shortlist with exact float32 squared L2 distances.
+    """
+
+    def __init__(self, ids: list, documents: list, embeddings: np.ndarray):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.bits = self._binarize(self.embeddings)
+
+    @staticmethod
+    def _binarize(embeddings: np.ndarray) -> np.ndarray:
+        return np.packbits(embeddings > 0, axis=1)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def query(self, query_embeddings: np.ndarray, n_results: int, include: list = None) -> dict:
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        n_results = min(n_results, self.count())
+        n_candidates = min(n_results * RESCORE_MULTIPLIER, self.count())
+
+        results = {'ids': [], 'documents': [], 'distances': []}
+        for query, query_bits in zip(query_embeddings, self._binarize(query_embeddings)):
+            # 1. Hamming distance to every document: popcount of the XOR-ed bytes
+            hamming = np.bitwise_count(np.bitwise_xor(self.bits, query_bits)).sum(axis=1, dtype=np.int32)
+            candidates = np.argpartition(hamming, n_candidates - 1)[:n_candidates]
+
+            # 2. Exact float32 distances for the shortlist only, then keep the top N
+            distances = ((self.embeddings[candidates] - query) ** 2).sum(axis=1)
+            order = np.argsort(distances)[:n_results]
+            keys = candidates[order]
+            results['ids'].append([self.ids[k] for k in keys])
+            results['documents'].append([self.documents[k] for k in keys])
+            results['distances'].append(distances[order].tolist())
+        return results
+
+
+class FlatNumpyIndex:
+    """
+    Exact brute-force search in NumPy.
+    For a corpus that fits in RAM (like the 8k-headline test subset) one matrix product
+    over all L2-normalized vectors is cheaper than the HNSW graph walk: on unit vectors
+    the squared L2 distance is simply 2 - 2 * cosine similarity.
+    """
+
+    def __init__(self, ids: list, documents: list, embeddings: np.ndarray):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        # Normalize into a new (writable) array; the memory-mapped embeddings are read-only
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def query(self, query_embeddings: np.ndarray, n_results: int, include: list = None) -> dict:
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        query_embeddings = query_embeddings / np.linalg.norm(query_embeddings, axis=1, keepdims=True)
+        n_results = min(n_results, self.count())
+
+        # Cosine similarity of every query to every document in a single GEMM call
+        similarities = query_embeddings @ self.embeddings.T
+
+        results = {'ids': [], 'documents': [], 'distances': []}
+        for row in similarities:
+            # Unordered top N first, then sort only those N by similarity (highest first)
+            top = np.argpartition(-row, n_results - 1)[:n_results]
+            keys = top[np.argsort(-row[top])]
+            distances = np.maximum(2 - 2 * row[keys], 0)
+            results['ids'].append([self.ids[k] for k in keys])
+            results['documents'].append([self.documents[k] for k in keys])
+            results['distances'].append(distances.tolist())
+        return results
+
+
+# Name -> index class, selected with the VECTOR_BACKEND setting of each evaluation script
+BACKENDS = {
+    'numpy-flat': FlatNumpyIndex,
+    'usearch-int8': Int8USearchIndex,
+    'faiss-ivfpq': FaissIVFPQIndex,
+    'binary-rescore': BinaryRescoreIndex,
+}
+
+
+def load_backend(collection: chromadb.Collection, backend: str):
+    """
+    Returns the Chroma collection itself for the 'chroma' backend; otherwise builds the
+    requested index from the precomputed (memory-mapped) embeddings, falling back to the
+    embeddings stored in the collection.
+    """
+    if backend == 'chroma':
+        return collection
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector backend '{backend}'. Choose from: chroma, {', '.join(BACKENDS)}")
+
+    print(f"--- Building '{backend}' index from collection '{collection.name}'...")
+    cached = load_cached_embeddings((collection.metadata or {}).get("data_signature"))
+    data = collection.get(include=['documents'])
+    if cached is not None and cached[0] == data['ids']:
+        embeddings = cached[1]
+    else:
+        data = collection.get(include=['documents', 'embeddings'])
+        embeddings = np.asarray(data['embeddings'], dtype=np.float32)
+    index = BACKENDS[backend](data['ids'], data['documents'], embeddings)
+    print(f"    ✅ Indexed {index.count()} documents.")
+    return index
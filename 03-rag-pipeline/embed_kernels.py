@@ -0,0 +1,35 @@
+import numpy as np
+from numba import njit, prange
+
+# --- Numba-compiled Embedding Kernels ---
+# Post-processing for the ONNXEmbedder in rag_setup.py. Numba compiles it to native,
+# multi-threaded code (cached on disk after the first run), which removes the NumPy
+# dispatch overhead that dominates for small batches such as a single query.
+
+@njit(parallel=True, fastmath=True, cache=True)
+def mean_pool_l2(token_embeddings: np.ndarray, attention_mask: np.ndarray, normalize: bool) -> np.ndarray:
+    """
+    Mean-pools (batch, tokens, dim) token embeddings over the real (non-padding) tokens of
+    each sentence, and optionally L2-normalizes the result. Returns a (batch, dim) float32 array.
+    """
+    batch_size, n_tokens, dim = token_embeddings.shape
+    pooled = np.zeros((batch_size, dim), dtype=np.float32)
+    for b in prange(batch_size):
+        count = 0
+        for t in range(n_tokens):
+            if attention_mask[b, t]:
+                count += 1
+                for d in range(dim):
+                    pooled[b, d] += token_embeddings[b, t, d]
+
+        scale = np.float32(1.0) / max(count, 1)
+        if normalize:
+            norm = np.float32(0.0)
+            for d in range(dim):
+                norm += pooled[b, d] * pooled[b, d]
+            if norm > 0:
+                # The 1/count factor cancels out under normalization
+                scale = np.float32(1.0) / np.sqrt(norm)
+        for d in range(dim):
+            pooled[b, d] *= scale
+    return pooled
@@ -1,13 +1,49 @@
 import os
-import json
+import orjson
+import random
 import asyncio
-from rag_setup import setup_chroma_and_embed_data, get_context_for_rag, EMBEDDING_MODEL_NAME, DATA_FILE_PATH
+from rag_setup import setup_chroma_and_embed_data, get_context_for_rag_async, get_contexts_for_rag_async, load_embedding_model, EMBEDDING_MODEL_NAME, DATA_FILE_PATH, CHROMA_DB_PATH
 
 # --- Configuration for Gemini API ---
 # NOTE: Leave this API key as an empty string. Canvas will provide the necessary credentials at runtime.
 GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY", "")
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key={GEMINI_API_KEY}"
+GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
 MODEL_NAME = "gemini-2.5-flash-preview-05-20"
+# Maximum number of Gemini requests in flight at once; more concurrent callers wait for a
+# free slot instead of all hitting the API together and triggering rate limiting (HTTP 429)
+GEMINI_MAX_INFLIGHT = int(os.getenv("GEMINI_MAX_INFLIGHT", "8"))
+# Retry backoff bounds (seconds) for rate-limited (429) or failed (5xx / network) requests
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+# --- Shared HTTP Session ---
+# One pooled aiohttp session is reused for every Gemini call (and every retry), so the
+# TCP + TLS handshake with the API host happens once instead of on every request.
+_SESSION = None
+_GEMINI_SEMAPHORE = asyncio.Semaphore(GEMINI_MAX_INFLIGHT)
+
+async def get_session():
+    """Returns the shared aiohttp session, creating it on first use."""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        import aiohttp
+        # Twice as many pooled connections as in-flight requests, so sockets are never the bottleneck
+        max_connections = GEMINI_MAX_INFLIGHT * 2
+        connector = aiohttp.TCPConnector(
+            limit=max_connections, limit_per_host=max_connections, ttl_dns_cache=300, keepalive_timeout=60
+        )
+        # Answers are streamed, so there is no limit on the whole response, only on connecting
+        # and on the gap between two chunks (a stalled stream still fails after 30 s)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+        _SESSION = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _SESSION
+
+async def close_session():
+    """Closes the shared aiohttp session (call once, when all requests are done)."""
+    global _SESSION
+    if _SESSION is not None:
+        await _SESSION.close()
+        _SESSION = None
 
 # --- Prompt Engineering: The RAG Template ---
 # This prompt guides the LLM on how to use the context provided by the vector search.
@@ -18,85 +54,144 @@ SYSTEM_INSTRUCTION_TEXT = (
     "you must state, 'I cannot find the answer in the provided news headlines.'"
 )
 
-def create_rag_prompt(user_query: str, context: str) -> dict:
+# Fixed text around the user query and the retrieved context in every RAG prompt
+_PROMPT_PREFIX = "User Query: "
+_PROMPT_SUFFIX = "\n\nBased on the headlines above, please answer the user's query."
+
+# Everything in the request body except the user turn is the same for every query, so that
+# JSON envelope (including the system instruction) is serialized once, at import time:
+# request body = _PAYLOAD_TEMPLATE[0] + <serialized user part> + _PAYLOAD_TEMPLATE[1]
+_PAYLOAD_TEMPLATE = (
+    b'{"contents":[',
+    b'],"systemInstruction":' + orjson.dumps({"parts": [{"text": SYSTEM_INSTRUCTION_TEXT}]}) + b'}',
+)
+
+def build_user_part(user_query: str, context: str) -> dict:
     """
-    Constructs the final payload structure for the Gemini API, including the system instruction
-    and the user query combined with the retrieved context.
+    Builds the only part of the Gemini payload that changes per query: the user turn,
+    combining the user query with the retrieved context.
     """
-    
-    # 1. Define the system instruction to guide the model's behavior
-    system_instruction_part = {
-        "parts": [{"text": SYSTEM_INSTRUCTION_TEXT}]
-    }
-    
-    # 2. Define the main user query payload, which includes the retrieved context
-    rag_query = f"User Query: {user_query}\n\n{context}\n\nBased on the headlines above, please answer the user's query."
-    user_content_part = {
-        "parts": [{"text": rag_query}]
-    }
-    
-    payload = {
-        "contents": [user_content_part],
-        "systemInstruction": system_instruction_part
-    }
-    return payload
+    rag_query = "".join((_PROMPT_PREFIX, user_query, "\n\n", context, _PROMPT_SUFFIX))
+    return {"parts": [{"text": rag_query}]}
+
+def serialize_payload(user_part: dict) -> bytes:
+    """Returns the complete JSON request body: the cached envelope around the serialized user part."""
+    return b''.join((_PAYLOAD_TEMPLATE[0], orjson.dumps(user_part), _PAYLOAD_TEMPLATE[1]))
+
+def extract_chunk_text(chunk: dict) -> str:
+    """
+    Safely extracts the generated text from one streamed response chunk. The keys are
+    almost always present, so a single try/except is cheaper than chained .get() calls
+    that build throw-away default dicts and lists.
+    """
+    try:
+        return chunk['candidates'][0]['content']['parts'][0]['text']
+    except (KeyError, IndexError, TypeError):
+        return ''
 
-async def generate_grounded_answer(payload: dict) -> str:
+def backoff_delay(attempt: int, retry_after: float = 0.0) -> float:
     """
-    Makes the non-streaming API call to the Gemini model and extracts the response.
-    Includes basic error handling and exponential backoff for reliability.
+    Full-jitter exponential backoff: a random delay up to RETRY_BASE_DELAY * 2^attempt, so
+    concurrent failing requests do not all retry at the same moment. Never shorter than
+    the server's Retry-After hint.
+    """
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+    return max(delay, retry_after)
+
+def parse_retry_after(value: str) -> float:
+    """Parses a Retry-After header given in seconds (0 if missing or not a number)."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+async def generate_grounded_answer(user_part: dict, echo: bool = False) -> str:
+    """
+    Makes the streaming API call to the Gemini model for one user turn (see build_user_part)
+    and assembles the response from its chunks.
+    With echo=True, every chunk is printed as soon as it arrives.
+    Includes basic error handling and jittered exponential backoff for reliability: only
+    rate limiting (429), server errors (5xx) and network failures are retried.
     """
     max_retries = 3
+    payload = serialize_payload(user_part) # Serialized once, reused by every retry
     
     for attempt in range(max_retries):
+        chunks = []
         try:
             # Note: We use the local fetch function provided by the Canvas environment
             # This handles authentication via the empty GEMINI_API_KEY string
 
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
+            session = await get_session()
+            # Hold one of the GEMINI_MAX_INFLIGHT slots for the whole request, including the stream
+            async with _GEMINI_SEMAPHORE:
                 async with session.post(
                     GEMINI_API_URL,
                     headers={'Content-Type': 'application/json'},
-                    data=json.dumps(payload)
+                    data=payload
                 ) as response:
-                    if response.status != 200:
-                        print(f"API Error (Status {response.status}): {await response.text()}")
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(2 ** attempt) # Exponential backoff
-                            continue
-                        return "Error: Failed to connect to the LLM service after multiple retries."
+                    if response.status == 200:
+                        # Server-sent events: every generated chunk arrives as one 'data: {...}' line
+                        async for line in response.content:
+                            if not line.startswith(b'data:'):
+                                continue
+                            text = extract_chunk_text(orjson.loads(line[5:]))
+                            chunks.append(text)
+                            if echo:
+                                print(text, end="", flush=True)
+                        if echo:
+                            print()
 
-                    result = await response.json()
+                        return "".join(chunks) or 'No response generated.'
 
-                    # Safely extract the generated text
-                    candidate = result.get('candidates', [{}])[0]
-                    generated_text = candidate.get('content', {}).get('parts', [{}])[0].get('text', 'No response generated.')
+                    print(f"API Error (Status {response.status}): {await response.text()}")
+                    if response.status != 429 and response.status < 500:
+                        # Other client errors (e.g. 400 Bad Request) would fail the same way again
+                        return f"Error: The LLM service rejected the request (Status {response.status})."
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
 
-                    return generated_text
+            # Back off outside the semaphore, so a waiting retry does not block other requests
+            if attempt < max_retries - 1:
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+                continue
+            return "Error: Failed to connect to the LLM service after multiple retries."
 
         except Exception as e:
+            if chunks:
+                # The stream broke after part of the answer arrived: keep the partial answer
+                # instead of retrying (and paying for) the whole generation again
+                print(f"\nStream interrupted on attempt {attempt + 1}: {e}")
+                return "".join(chunks)
             print(f"Fetch failed on attempt {attempt + 1}: {e}")
             if attempt < max_retries - 1:
-                await asyncio.sleep(2 ** attempt) # Exponential backoff
+                await asyncio.sleep(backoff_delay(attempt))
                 continue
             return "Error: An unexpected error occurred during the API call."
             
     return "Error: Failed to generate response."
 
 
+# --- Test Cases ---
+# (user query, heading printed above the generated answer)
+TEST_CASES = [
+    # Test Case 1: Clear and direct question (should work)
+    ("What happened to the American Airlines flyer who hit a flight attendant?", "Grounded Answer from Gemini"),
+    # Test Case 2: Unanswerable question (should fail gracefully)
+    # The data contains headlines, not detailed text, and no sports scores.
+    ("What was the final score of the Lakers game last night?", "Grounded Answer from Gemini (Expected to be 'Unanswerable')"),
+]
+
 async def main():
     """
     Main function to orchestrate the RAG process: Retrieval -> Prompt -> Generation.
     """
     # 1. Initialize ChromaDB and Sentence Transformer (assuming it's already done by running rag_setup.py)
-    # We re-initialize here to get client/model instances, but setup_chroma_and_embed_data handles idempotency.
+    # We re-initialize here to get client/model instances; setup_chroma_and_embed_data reuses the persisted collection.
     import chromadb
-    from sentence_transformers import SentenceTransformer
     
     try:
-        chroma_client = chromadb.Client()
-        embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+        embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME)
     except Exception as e:
         print(f"Initialization Error: {e}")
         print("Please ensure 'chromadb' and 'sentence-transformers' libraries are installed.")
@@ -109,43 +204,55 @@ async def main():
     print("🔥 Running Complete RAG Pipeline (Retrieval-Augmented Generation)")
     print("="*70)
 
-    # --- Test Case 1: Clear and direct question (should work) ---
-    query_1 = "What happened to the American Airlines flyer who hit a flight attendant?"
-    print(f"\n[Test 1] User Query: {query_1}")
-    
-    # Retrieval Step: Get context from the vector database
-    context_1 = get_context_for_rag(chroma_client, embedding_model, query_1)
-    
-    # Prompt Engineering Step: Assemble the RAG payload
-    payload_1 = create_rag_prompt(query_1, context_1)
-    
-    # Generation Step: Get the grounded answer from Gemini
-    answer_1 = await generate_grounded_answer(payload_1)
-    
-    print("\n--- Retrieved Context ---")
-    print(context_1)
-    print("\n--- Grounded Answer from Gemini ---")
-    print(answer_1)
-    
-    print("-" * 50)
-    
-    # --- Test Case 2: Unanswerable question (should fail gracefully) ---
-    # The data contains headlines, not detailed text, and no sports scores.
-    query_2 = "What was the final score of the Lakers game last night?"
-    print(f"\n[Test 2] User Query: {query_2}")
-    
-    context_2 = get_context_for_rag(chroma_client, embedding_model, query_2)
-    payload_2 = create_rag_prompt(query_2, context_2)
-    answer_2 = await generate_grounded_answer(payload_2)
-    
-    print("\n--- Retrieved Context ---")
-    print(context_2)
-    print("\n--- Grounded Answer from Gemini (Expected to be 'Unanswerable') ---")
-    print(answer_2)
+    queries = [query for query, _ in TEST_CASES]
+    later_contexts = None
+
+    # Generation runs one query at a time (one in-flight LLM request, printed live as it streams)
+    for i, (query, answer_title) in enumerate(TEST_CASES, start=1):
+        if i > 1:
+            print("-" * 50)
+        print(f"\n[Test {i}] User Query: {query}")
+
+        # Retrieval Step: The first query is retrieved on its own, so its answer can start streaming right away
+        try:
+            if i == 1:
+                context = await get_context_for_rag_async(chroma_client, embedding_model, query)
+            else:
+                context = (await later_contexts)[i - 2]
+        except Exception as e:
+            print(f"Error while retrieving the context: {e}")
+            context = None
+
+        if i == 1 and len(queries) > 1:
+            # While the first answer streams, embed and search all remaining queries in one batch
+            # (a single forward pass and a single ChromaDB call) in a worker thread
+            later_contexts = asyncio.create_task(
+                get_contexts_for_rag_async(chroma_client, embedding_model, queries[1:])
+            )
+
+        if context is None:
+            continue
+
+        print("\n--- Retrieved Context ---")
+        print(context)
+
+        # Prompt Engineering Step: Build the user turn (the rest of the payload is cached)
+        user_part = build_user_part(query, context)
+
+        # Generation Step: Stream the grounded answer from Gemini
+        print(f"\n--- {answer_title} ---")
+        await generate_grounded_answer(user_part, echo=True)
     
     print("\n" + "="*70)
     print("RAG Pipeline Complete.")
     print("="*70)
 
+async def run():
+    """Runs the pipeline and always closes the shared HTTP session afterwards."""
+    try:
+        await main()
+    finally:
+        await close_session()
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(run())
\ No newline at end of file
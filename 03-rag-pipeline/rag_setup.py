@@ -1,61 +1,204 @@
-import json
+import orjson
 import chromadb
 from sentence_transformers import SentenceTransformer
-import pandas as pd
+import os
 import asyncio
+import functools
+import itertools
+import hashlib
+import numpy as np
+import torch
 
 # --- Configuration ---
 DATA_FILE_PATH = "../data/News_Category_Dataset_v3.json" 
 CHROMA_COLLECTION_NAME = "news_test_collection"
+# On-disk ChromaDB store: the headlines are embedded once and reused by later runs
+CHROMA_DB_PATH = "./chroma_db"
 EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2' 
 K_CONTEXT = 3 # Number of relevant documents to retrieve for the LLM
 BATCH_SIZE = 5000 # Max documents to process per batch
+MAX_RECORDS = 10000 # Limit to a smaller number for faster demonstration
+# Per-headline metadata stored next to each vector, used to pre-filter searches
+# ('date' is stored as an integer YYYYMMDD so it supports range filters like $gte)
+METADATA_FIELDS = ("category", "date")
+QUERY_CACHE_SIZE = 1024 # Number of recent query embeddings kept in memory
+# Set USE_ONNX=1 to embed with an int8-quantized ONNX Runtime export of the model (see ONNXEmbedder)
+USE_ONNX = os.getenv("USE_ONNX", "0") == "1"
+ONNX_MODEL_DIR = "./onnx_model" # Where the exported and quantized model is cached
+# Explicit HNSW index settings: cosine space for the normalized embeddings, a denser graph
+# (M) and wider build/search beams (ef) keep recall high as the collection grows
+HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 200,
+    "hnsw:M": 128,
+    "hnsw:search_ef": 128,
+}
+
+class ONNXEmbedder:
+    """
+    Int8-quantized ONNX Runtime version of the embedding model, used when USE_ONNX=1.
+    On first use the model is exported to ONNX and dynamically quantized to int8 (weights
+    stored as int8, activations quantized on the fly, which maps onto AVX512-VNNI int8 dot
+    products); later runs load the cached model from ONNX_MODEL_DIR.
+    Implements the subset of SentenceTransformer.encode() used in this project:
+    tokenize -> ONNX forward pass -> mean pooling -> (optional) L2 normalization.
+    """
+
+    MAX_SEQ_LENGTH = 256 # Same truncation length as the all-MiniLM-L6-v2 SentenceTransformer
+    QUANTIZED_FILE_NAME = "model_quantized.onnx"
+
+    def __init__(self, model_name: str, model_dir: str = ONNX_MODEL_DIR):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        if not os.path.exists(os.path.join(model_dir, self.QUANTIZED_FILE_NAME)):
+            print(f"    Exporting '{model_name}' to ONNX and quantizing it to int8 (one-time step)...")
+            model_id = f"sentence-transformers/{model_name}"
+            onnx_model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+            quantizer = ORTQuantizer.from_pretrained(onnx_model)
+            quantization_config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=model_dir, quantization_config=quantization_config)
+            AutoTokenizer.from_pretrained(model_id).save_pretrained(model_dir)
+
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name=self.QUANTIZED_FILE_NAME)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def encode(self, sentences: list, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False) -> np.ndarray:
+        from embed_kernels import mean_pool_l2
+
+        # Encode in order of length (like SentenceTransformer) so each batch needs little padding
+        order = np.argsort([-len(sentence) for sentence in sentences], kind='stable')
+        embeddings = np.empty((len(sentences), self.model.config.hidden_size), dtype=np.float32)
+
+        for start in range(0, len(sentences), batch_size):
+            batch_indices = order[start:start + batch_size]
+            tokens = self.tokenizer(
+                [sentences[i] for i in batch_indices], padding=True, truncation=True,
+                max_length=self.MAX_SEQ_LENGTH, return_tensors='np'
+            )
+            token_embeddings = self.model(**tokens).last_hidden_state
+
+            # Mean pooling over the real (non-padding) tokens (+ L2 normalization) in one compiled kernel
+            embeddings[batch_indices] = mean_pool_l2(
+                np.ascontiguousarray(token_embeddings, dtype=np.float32), tokens['attention_mask'], normalize_embeddings
+            )
+
+        return embeddings
+
+# Collection handle cached by setup_chroma_and_embed_data (or the first retrieval),
+# so queries do not look the collection up in ChromaDB every time
+_COLLECTION = None
+
+def get_rag_collection(client: chromadb.Client) -> chromadb.Collection:
+    """Returns the cached RAG collection handle, fetching it from ChromaDB only on first use."""
+    global _COLLECTION
+    if _COLLECTION is None:
+        _COLLECTION = client.get_collection(name=CHROMA_COLLECTION_NAME)
+    return _COLLECTION
+
+def load_embedding_model(model_name: str) -> SentenceTransformer:
+    """
+    Loads the Sentence Transformer: fp16 on the GPU when available, otherwise ONNX Runtime on the CPU.
+    With USE_ONNX=1, returns the int8-quantized ONNXEmbedder instead.
+    """
+    if USE_ONNX:
+        return ONNXEmbedder(model_name)
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    if device == 'cpu':
+        # ONNX Runtime on the CPU, fp16 on the GPU: see load_embedding_model() in 01-semantic-search
+        try:
+            return SentenceTransformer(model_name, device=device, backend='onnx')
+        except Exception as e:
+            print(f"    Note: ONNX backend unavailable ({e}); falling back to PyTorch.")
+        # Let PyTorch's intra-op thread pool use every core this process may run on
+        # (its default can be lower inside containers)
+        torch.set_num_threads(os.process_cpu_count())
+    model = SentenceTransformer(model_name, device=device)
+    if device == 'cuda':
+        model.half()
+    return model
+
+def compute_data_signature(file_path: str) -> str:
+    """
+    Short content hash of the data file plus the settings that shape the stored vectors and
+    the index (the embedder, since the int8 ONNX model's vectors differ slightly from the
+    PyTorch ones, and the HNSW parameters), used to tell whether a persisted collection is
+    still up to date.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(f"{EMBEDDING_MODEL_NAME}|onnx={USE_ONNX}|{MAX_RECORDS}|{','.join(METADATA_FIELDS)}".encode())
+    digest.update(orjson.dumps(HNSW_METADATA, option=orjson.OPT_SORT_KEYS))
+    return digest.hexdigest()[:16]
 
 def setup_chroma_and_embed_data(client: chromadb.Client, model: SentenceTransformer, file_path: str):
     """Loads the subset data and populates a new ChromaDB collection, using batching to avoid errors."""
+    global _COLLECTION
     print(f"--- Setting up collection '{CHROMA_COLLECTION_NAME}'...")
+    _COLLECTION = None
 
-    # Ensure we start fresh by deleting the collection if it exists
     try:
-        client.delete_collection(CHROMA_COLLECTION_NAME) 
-    except Exception:
-        pass # Ignore error if collection does not exist
+        # Reuse the persisted collection if it was fully built from this exact data file and model
+        signature = compute_data_signature(file_path)
+        try:
+            collection = client.get_collection(name=CHROMA_COLLECTION_NAME)
+            if (collection.metadata or {}).get("data_signature") == signature:
+                print(f"    ✅ Reusing {collection.count()} documents already indexed in '{CHROMA_DB_PATH}'.")
+                _COLLECTION = collection
+                return collection
+            # Stale or half-built collection: start fresh
+            client.delete_collection(CHROMA_COLLECTION_NAME)
+        except Exception:
+            pass # Collection does not exist yet
 
-    collection = client.get_or_create_collection(name=CHROMA_COLLECTION_NAME)
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            # Load the JSON Lines file containing the filtered test data
-            df = pd.DataFrame([json.loads(line) for line in f])
-            documents = df['headline'].tolist()
-
-            # Limit to a smaller number for faster demonstration
-            MAX_RECORDS = 10000
-            documents = documents[:MAX_RECORDS]
-            
-            # Prepare data for ChromaDB: ids, embeddings, and documents (text)
-            ids = [f"doc_{i}" for i in range(len(documents))]
-            total_docs = len(documents)
+        collection = client.create_collection(name=CHROMA_COLLECTION_NAME, metadata=HNSW_METADATA)
+
+        with open(file_path, 'rb') as f:
+            # Stream the JSON Lines file lazily: parse one line at a time, keep only records with
+            # a headline and stop after MAX_RECORDS, so at most one batch is held in memory
+            records = (orjson.loads(line) for line in f)
+            records = itertools.islice((record for record in records if record.get('headline')), MAX_RECORDS)
             
-            print(f"    Total documents to embed: {total_docs}")
+            print(f"    Embedding up to {MAX_RECORDS} documents in batches of {BATCH_SIZE}...")
 
             # Implement batching to avoid exceeding internal limits (e.g., 5461)
-            for i in range(0, total_docs, BATCH_SIZE):
-                batch_documents = documents[i:i + BATCH_SIZE]
-                batch_ids = ids[i:i + BATCH_SIZE]
+            batches = iter(lambda: list(itertools.islice(records, BATCH_SIZE)), [])
+            for batch_number, batch_records in enumerate(batches):
+                # Prepare data for ChromaDB: ids, embeddings, documents (text) and metadata
+                start = batch_number * BATCH_SIZE
+                batch_ids = [f"doc_{j}" for j in range(start, start + len(batch_records))]
+                batch_documents = [record['headline'] for record in batch_records]
+                batch_metadatas = [
+                    {"category": record.get('category', ''), "date": int(record.get('date', '0').replace('-', '') or 0)}
+                    for record in batch_records
+                ]
                 
-                # Encode the headlines to create vector embeddings
-                batch_embeddings = model.encode(batch_documents).tolist()
+                # Encode the headlines to create vector embeddings (one call per 5000-doc batch, so
+                # sentence-transformers can sort the whole batch by length and minimize padding)
+                batch_embeddings = model.encode(
+                    batch_documents, batch_size=256, convert_to_numpy=True, normalize_embeddings=True,
+                    show_progress_bar=False
+                )
                 
                 # Add the batch to ChromaDB
                 collection.add(
                     embeddings=batch_embeddings,
                     documents=batch_documents,
+                    metadatas=batch_metadatas,
                     ids=batch_ids
                 )
-                print(f"    Processed batch {i // BATCH_SIZE + 1}. Documents added: {len(batch_documents)}")
+                print(f"    Processed batch {batch_number + 1}. Documents added: {len(batch_documents)}")
+                
+            # Record the data signature only now, so an interrupted run is rebuilt next time
+            # (the HNSW settings are kept in the collection's configuration)
+            collection.modify(metadata={"data_signature": signature})
                 
             print(f"--- ✅ Setup Complete. Total documents indexed: {collection.count()} ---")
+            _COLLECTION = collection
             return collection
 
     except FileNotFoundError:
@@ -70,21 +213,39 @@ def format_context(documents: list) -> str:
     context_str = "\n".join([f"Headline {i+1}: {doc}" for i, doc in enumerate(documents)])
     return f"Retrieved Context:\n---\n{context_str}\n---"
 
-def get_context_for_rag(client: chromadb.Client, model: SentenceTransformer, query: str) -> str:
+@functools.lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _embed_query(model: SentenceTransformer, query: str) -> np.ndarray:
+    """
+    Embeds a single query, memoized per (model, query): repeated questions skip the transformer.
+    The cached array is shared between callers, so it is returned read-only.
+    """
+    embedding = model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
+    embedding.setflags(write=False)
+    return embedding
+
+def build_where_filter(categories: list = None) -> dict:
+    """Returns a ChromaDB metadata filter restricting the search to the given categories (None = no filter)."""
+    if not categories:
+        return None
+    return {"category": {"$in": list(categories)}}
+
+def get_context_for_rag(client: chromadb.Client, model: SentenceTransformer, query: str, categories: list = None) -> str:
     """
     Performs the vector search and returns a formatted string of the top K results.
-    This is the core RAG retrieval step.
+    This is the core RAG retrieval step. Pass `categories` (e.g. ["POLITICS"]) to search
+    only headlines from those news categories; the filter is applied before the ANN search.
     """
-    collection = client.get_collection(name=CHROMA_COLLECTION_NAME)
+    collection = get_rag_collection(client)
     
-    # 1. Embed the user query
-    query_embedding = model.encode([query]).tolist()
+    # 1. Embed the user query (served from the in-memory cache for repeated queries)
+    query_embedding = _embed_query(model, query)
     
     # 2. Retrieve the top K documents
     results = collection.query(
         query_embeddings=query_embedding,
         n_results=K_CONTEXT, 
-        include=['documents', 'distances'] 
+        where=build_where_filter(categories),
+        include=['documents'] # Only the text is used; skip serializing the distances
     )
     
     # 3. Extract the document text
@@ -97,12 +258,56 @@ def get_context_for_rag(client: chromadb.Client, model: SentenceTransformer, que
     # 4. Format the documents into a single string
     return format_context(retrieved_documents)
 
+async def get_context_for_rag_async(client: chromadb.Client, model: SentenceTransformer, query: str, categories: list = None) -> str:
+    """
+    Async version of get_context_for_rag: runs the (synchronous) embedding and ChromaDB
+    search in a worker thread, so the event loop stays free for e.g. streaming an LLM answer.
+    """
+    return await asyncio.to_thread(get_context_for_rag, client, model, query, categories)
+
+def get_contexts_for_rag(client: chromadb.Client, model: SentenceTransformer, queries: list, categories: list = None) -> list:
+    """
+    Batched version of get_context_for_rag: embeds all queries in a single forward pass,
+    searches for them in a single ChromaDB call and returns one formatted context per query.
+    """
+    collection = get_rag_collection(client)
+    
+    # 1. Embed all user queries in one batch
+    query_embeddings = model.encode(
+        queries, batch_size=len(queries), convert_to_numpy=True, normalize_embeddings=True
+    )
+    
+    # 2. Retrieve the top K documents for every query at once
+    results = collection.query(
+        query_embeddings=query_embeddings,
+        n_results=K_CONTEXT, 
+        where=build_where_filter(categories),
+        include=['documents'] 
+    )
+    
+    # 3. Format each query's documents (results are returned in query order)
+    contexts = []
+    for retrieved_documents in results['documents']:
+        if not retrieved_documents:
+            print("Warning: No documents retrieved from ChromaDB.")
+            contexts.append("No relevant context found.")
+        else:
+            contexts.append(format_context(retrieved_documents))
+    return contexts
+
+async def get_contexts_for_rag_async(client: chromadb.Client, model: SentenceTransformer, queries: list, categories: list = None) -> list:
+    """
+    Async version of get_contexts_for_rag: runs the (synchronous) batched embedding and ChromaDB
+    search in a worker thread, so the event loop stays free for e.g. streaming an LLM answer.
+    """
+    return await asyncio.to_thread(get_contexts_for_rag, client, model, queries, categories)
+
 if __name__ == "__main__":
     # This block ensures the vector database is initialized when the file is run standalone
     print("Initializing ChromaDB client and Sentence Transformer...")
     try:
-        chroma_client = chromadb.Client()
-        embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+        embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME)
     except Exception as e:
         print(f"Initialization Error: {e}")
         print("Please ensure 'chromadb' and 'sentence-transformers' libraries are installed.")